@@ -5,13 +5,49 @@ Twilio webhook handlers for call events and media streams.
 from fastapi import APIRouter, Request, Form, Response
 from twilio.twiml.voice_response import VoiceResponse, Start, Stream, Pause
 from typing import Optional
+from functools import lru_cache
 
 from config import settings
 from sessions.session_manager import session_manager
+from processing_loop import processing_loop
 from utils.logger import logger
 
 router = APIRouter()
 
+# Media stream base URL derived from TUNNEL_URL once at import (None if not set)
+_CACHED_WSS_BASE: Optional[str] = (
+    settings.tunnel_url.replace('https://', 'wss://').replace('http://', 'ws://')
+    if settings.tunnel_url else None
+)
+
+
+@lru_cache(maxsize=128)
+def _resolve_ws_base(host: str, is_https: bool) -> str:
+    """
+    Build the media stream base URL from request host info.
+    Cached per (host, scheme) so repeated calls skip the string checks.
+    
+    Args:
+        host: Host header value
+        is_https: Whether the request reached us over HTTPS
+        
+    Returns:
+        Base URL such as wss://example.ngrok.io
+    """
+    # Remove port 80/443 if present (not needed for WebSocket)
+    if host.endswith(':80'):
+        host = host[:-3]
+    elif host.endswith(':443'):
+        host = host[:-4]
+    
+    # If host contains ngrok or cloudflare, use wss
+    host_lower = host.lower()
+    if 'ngrok' in host_lower or 'cloudflare' in host_lower:
+        scheme = 'wss'
+    else:
+        scheme = 'wss' if is_https else 'ws'
+    return f"{scheme}://{host}"
+
 
 @router.post("/twilio/voice/status")
 async def handle_voice_status(request: Request):
@@ -31,6 +67,7 @@ async def handle_voice_status(request: Request):
             session = session_manager.get_session_by_call_sid(call_sid)
             if not session:
                 session = session_manager.create_session(call_sid)
+                processing_loop.mark_dirty(session)
                 logger.info(f"Created session for call: {call_sid}")
         
         elif call_status in ["completed", "failed", "busy", "no-answer", "canceled"]:
@@ -65,32 +102,20 @@ async def handle_incoming_call(request: Request):
         
         # Create session
         session = session_manager.create_session(call_sid)
+        processing_loop.mark_dirty(session)
         
         # Get tunnel URL for media stream
         # Use tunnel_url from settings, or construct from request if not set
-        if settings.tunnel_url:
-            base_url = settings.tunnel_url.replace('https://', 'wss://').replace('http://', 'ws://')
-        else:
+        base_url = _CACHED_WSS_BASE
+        if base_url is None:
             # Try to get from request headers (when behind ngrok/proxy)
-            host = request.headers.get('host', 'localhost:8000')
-            # Remove port 80/443 if present (not needed for WebSocket)
-            if host.endswith(':80'):
-                host = host[:-3]
-            elif host.endswith(':443'):
-                host = host[:-4]
-            
-            # If host contains ngrok or cloudflare, use wss
-            if 'ngrok' in host.lower() or 'cloudflare' in host.lower() or 'trycloudflare' in host.lower():
-                scheme = 'wss'
-            else:
-                # Check if request came via HTTPS
-                forwarded_proto = request.headers.get('x-forwarded-proto', '')
-                referer = request.headers.get('referer', '')
-                if forwarded_proto == 'https' or 'https://' in referer or 'https' in str(request.url):
-                    scheme = 'wss'
-                else:
-                    scheme = 'ws'
-            base_url = f"{scheme}://{host}"
+            headers = request.headers
+            is_https = (
+                headers.get('x-forwarded-proto', '') == 'https'
+                or 'https://' in headers.get('referer', '')
+                or request.url.scheme == 'https'
+            )
+            base_url = _resolve_ws_base(headers.get('host', 'localhost:8000'), is_https)
         
         # IMPORTANT: Twilio uses the call_sid initially, but will send stream_sid in events
         # The WebSocket endpoint accepts call_sid and will map it to stream_sid when received
@@ -163,6 +188,7 @@ async def handle_media_start(request: Request):
             # Create session if it doesn't exist
             logger.info(f"No existing session found, creating new session for call {call_sid}")
             session = session_manager.create_session(call_sid, stream_sid)
+            processing_loop.mark_dirty(session)
             logger.info(f"Created session {session.call_session_id} with stream {stream_sid}")
         
         return Response(content="OK", status_code=200)
@@ -4,12 +4,36 @@ Handles both UI WebSocket connections and Twilio media streams.
 """
 
 from fastapi import WebSocket, WebSocketDisconnect
-from typing import Dict, Set
+from typing import Dict, Set, Union
+import asyncio
 import json
 
+import msgspec
+import orjson
+
+from audio.models import twilio_frame_decoder
 from utils.logger import logger
 
 
+def encode_ui_message(message: Union[dict, str]) -> str:
+    """
+    Serialize a UI message to JSON text.
+    
+    All UI messages go through this encoder; producers that send the same
+    message more than once can encode it here up front and pass the text.
+    
+    Args:
+        message: Message dict (may contain msgspec structs such as
+            Suggestion), or JSON text already returned by encode_ui_message
+        
+    Returns:
+        JSON text frame payload (the UI parses text frames)
+    """
+    if isinstance(message, str):
+        return message
+    return orjson.dumps(message, default=msgspec.to_builtins).decode()
+
+
 class ConnectionManager:
     """Manages WebSocket connections."""
     
@@ -55,28 +79,33 @@ class ConnectionManager:
             del self.media_connections[stream_sid]
             logger.info(f"Media stream WebSocket disconnected: {stream_sid}")
     
-    async def send_to_ui(self, session_id: str, message: dict):
-        """Send message to UI WebSocket client."""
+    async def send_to_ui(self, session_id: str, message: Union[dict, str]):
+        """Send message (dict or text from encode_ui_message) to UI WebSocket client."""
         if session_id in self.ui_connections:
             try:
-                await self.ui_connections[session_id].send_json(message)
+                await self.ui_connections[session_id].send_text(encode_ui_message(message))
             except Exception as e:
                 logger.error(f"Error sending to UI for {session_id}: {e}")
                 await self.disconnect_ui(session_id)
     
-    async def broadcast_to_ui(self, message: dict):
-        """Broadcast message to all UI connections."""
-        disconnected = []
-        for session_id, websocket in self.ui_connections.items():
-            try:
-                await websocket.send_json(message)
-            except Exception as e:
-                logger.error(f"Error broadcasting to {session_id}: {e}")
-                disconnected.append(session_id)
+    async def broadcast_to_ui(self, message: Union[dict, str]):
+        """Broadcast message (dict or text from encode_ui_message) to all UI connections."""
+        if not self.ui_connections:
+            return
+        
+        # Encode once and send to all clients concurrently
+        text = encode_ui_message(message)
+        connections = list(self.ui_connections.items())
+        results = await asyncio.gather(
+            *(websocket.send_text(text) for _, websocket in connections),
+            return_exceptions=True
+        )
         
         # Clean up disconnected clients
-        for session_id in disconnected:
-            await self.disconnect_ui(session_id)
+        for (session_id, _), result in zip(connections, results):
+            if isinstance(result, Exception):
+                logger.error(f"Error broadcasting to {session_id}: {result}")
+                await self.disconnect_ui(session_id)
 
 
 # Global connection manager instance
@@ -145,8 +174,8 @@ async def websocket_twilio_media(websocket: WebSocket, stream_sid: str):
         stream_sid: Twilio Media Stream SID (can be call_sid initially)
     """
     logger.info(f"WebSocket connection attempt received for stream: {stream_sid}")
-    logger.info(f"WebSocket headers: {dict(websocket.headers)}")
-    logger.info(f"WebSocket subprotocols: {websocket.subprotocols}")
+    logger.debug("WebSocket headers: %r", websocket.headers)
+    logger.debug("WebSocket subprotocols: %r", websocket.subprotocols)
     
     try:
         await manager.connect_media(stream_sid, websocket)
@@ -155,35 +184,39 @@ async def websocket_twilio_media(websocket: WebSocket, stream_sid: str):
         logger.error(f"Error accepting media stream WebSocket: {e}", exc_info=True)
         raise
     
+    from audio.stream_handler import audio_stream_handler
+    
+    event_count = 0  # Per connection
+    
     try:
         while True:
-            # Receive message from Twilio
-            data = await websocket.receive_text()
+            # Receive message from Twilio; the decoder takes text or bytes as-is
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                raise WebSocketDisconnect(message.get("code", 1000))
+            data = message.get("text") or message.get("bytes")
+            if not data:
+                continue
             
             try:
-                event_data = json.loads(data)
-                event_type = event_data.get("event")
+                frame = twilio_frame_decoder.decode(data)
+                event_type = frame.event
                 
                 # Log first few events to verify connection
-                if not hasattr(websocket_twilio_media, '_event_count'):
-                    websocket_twilio_media._event_count = 0
-                websocket_twilio_media._event_count += 1
-                
-                if websocket_twilio_media._event_count <= 5:
-                    logger.info(f"Received Twilio event #{websocket_twilio_media._event_count}: {event_type} for stream {stream_sid}")
+                if event_count < 5:
+                    event_count += 1
+                    logger.info(f"Received Twilio event #{event_count}: {event_type} for stream {stream_sid}")
                 
                 # Handle media events
-                from audio.stream_handler import audio_stream_handler
-                await audio_stream_handler.handle_media_event(event_data, stream_sid)
+                await audio_stream_handler.handle_media_event(frame, stream_sid)
                 
-            except json.JSONDecodeError as e:
+            except msgspec.DecodeError as e:
                 logger.error(f"Invalid JSON from Twilio: {e}")
             except Exception as e:
                 logger.error(f"Error processing Twilio media event: {e}", exc_info=True)
     
     except WebSocketDisconnect:
         logger.info(f"Twilio media WebSocket disconnected: {stream_sid}")
-        await manager.disconnect_media(stream_sid)
         
         # End session
         from sessions.session_manager import session_manager
@@ -193,4 +226,9 @@ async def websocket_twilio_media(websocket: WebSocket, stream_sid: str):
     
     except Exception as e:
         logger.error(f"Error in Twilio media WebSocket for {stream_sid}: {e}")
+    
+    finally:
+        # However the receive loop ended, stop the stream's feature worker and
+        # drop its per-stream state (both calls are no-ops if already done)
+        audio_stream_handler.release_stream(stream_sid)
         await manager.disconnect_media(stream_sid)
@@ -5,189 +5,172 @@ Extracts volume, pace, and other features from audio chunks.
 
 import numpy as np
 import audioop
-from typing import Tuple, Optional
+from numba import njit
+from typing import Tuple
 import math
 
 from config import settings
-from utils.logger import logger
 
+# Analysis window: 20 ms at 8 kHz (one Twilio media frame)
+SAMPLES_PER_WINDOW = 160
+# RMS energy above which a window counts as a "syllable" peak
+PEAK_RMS_THRESHOLD = 0.1
+# Volume above which a chunk is considered speech
+SPEECH_THRESHOLD_DB = -40.0
+# Sample rate of the sliding window buffers, resolved once from settings
+SAMPLE_RATE = settings.audio_sample_rate
 
-def decode_mulaw(audio_chunk: bytes) -> np.ndarray:
-    """
-    Decode mu-law encoded audio to linear PCM.
-    Twilio sends audio in mu-law format.
-    
-    Args:
-        audio_chunk: Mu-law encoded audio bytes
-        
-    Returns:
-        NumPy array of 16-bit PCM samples
-    """
-    try:
-        # Convert mu-law to linear PCM (16-bit)
-        linear_pcm = audioop.ulaw2lin(audio_chunk, 2)  # 2 = 16-bit
-        # Convert to numpy array
-        audio_array = np.frombuffer(linear_pcm, dtype=np.int16)
-        return audio_array.astype(np.float32) / 32768.0  # Normalize to [-1, 1]
-    except Exception as e:
-        logger.error(f"Error decoding mu-law audio: {e}")
-        return np.array([], dtype=np.float32)
+# Mu-law byte -> integer sample energy (max 32124**2, fits in uint32), built once at import
+_ENERGY_LUT = (
+    np.frombuffer(audioop.ulaw2lin(bytes(range(256)), 2), dtype=np.int16).astype(np.int64) ** 2
+).astype(np.uint32)
+# Full-scale 16-bit amplitude, used to normalize integer energies
+_FULL_SCALE = 32768.0
 
 
-def calculate_rms_energy(audio_array: np.ndarray) -> float:
-    """
-    Calculate RMS (Root Mean Square) energy of audio.
-    
-    Args:
-        audio_array: Normalized audio samples (-1 to 1)
-        
-    Returns:
-        RMS energy value
-    """
-    if len(audio_array) == 0:
-        return 0.0
-    
-    rms = np.sqrt(np.mean(audio_array ** 2))
-    return rms
+# nogil so the kernel can also be run from a worker thread
+@njit(cache=True, fastmath=True, boundscheck=False, nogil=True)
+def _window_rms_db(samples, lut, window_size, out_rms, out_db):
+    """Per-window energy-LUT gather + integer accumulate loop, compiled by Numba."""
+    n_samples = samples.shape[0]
+    for j in range(out_rms.shape[0]):
+        start = j * window_size
+        stop = min(start + window_size, n_samples)
+        energy = 0
+        for i in range(start, stop):
+            energy += lut[samples[i]]
+        rms = math.sqrt(energy / (stop - start)) / _FULL_SCALE
+        out_rms[j] = rms
+        out_db[j] = -60.0 if rms == 0.0 else max(-60.0, min(0.0, 20.0 * math.log10(rms)))
 
 
-def calculate_volume_db(audio_array: np.ndarray, reference: float = 1.0) -> float:
+def extract_features_batch(
+    audio: bytes,
+    window_size: int = SAMPLES_PER_WINDOW
+) -> Tuple[np.ndarray, np.ndarray]:
     """
-    Calculate volume in decibels.
+    Calculate per-window RMS and volume for a run of mu-law audio in one call.
+    
+    The raw bytes go straight to a Numba-compiled kernel (no decode pass).
     
     Args:
-        audio_array: Normalized audio samples
-        reference: Reference level (default 1.0 for normalized audio)
+        audio: Mu-law encoded audio bytes (typically several frames joined)
+        window_size: Samples per window; a shorter tail forms the last window
         
     Returns:
-        Volume in dB
+        Tuple of (rms_values, db_values), one entry per window
     """
-    rms = calculate_rms_energy(audio_array)
-    
-    if rms == 0:
-        return -60.0  # Silence threshold
-    
-    # Convert to dB
-    db = 20 * math.log10(rms / reference)
-    
-    # Clamp to reasonable range
-    return max(-60.0, min(0.0, db))
+    n_windows = -(-len(audio) // window_size)
+    rms_values = np.empty(n_windows, dtype=np.float64)
+    db_values = np.empty(n_windows, dtype=np.float64)
+    if n_windows:
+        _window_rms_db(
+            np.frombuffer(audio, dtype=np.uint8), _ENERGY_LUT, window_size, rms_values, db_values
+        )
+    return rms_values, db_values
 
 
-def estimate_speaking_rate(audio_buffer: list, sample_rate: int = 8000) -> float:
+def _words_per_minute(peak_count: int, total_samples: int, sample_rate: int) -> float:
     """
-    Estimate speaking rate (words per minute) from audio buffer.
-    This is a simple approximation for PoC.
+    Estimate WPM from the number of energy peaks over total_samples of audio.
     
-    Args:
-        audio_buffer: List of audio chunks
-        sample_rate: Audio sample rate
-        
-    Returns:
-        Estimated words per minute
+    Simple heuristic for PoC: each energy peak counts as a "syllable".
     """
-    if not audio_buffer:
-        return 0.0
-    
-    # Calculate total duration
-    total_samples = sum(len(chunk) for chunk in audio_buffer)
     duration_seconds = total_samples / sample_rate
     
     if duration_seconds == 0:
         return 0.0
     
-    # Simple heuristic: count energy peaks as "syllables"
-    # This is a rough approximation
-    peak_count = 0
-    threshold = 0.1  # Energy threshold for peaks
-    
-    for chunk in audio_buffer:
-        try:
-            audio_array = decode_mulaw(chunk)
-            if len(audio_array) > 0:
-                energy = calculate_rms_energy(audio_array)
-                if energy > threshold:
-                    peak_count += 1
-        except Exception:
-            continue
-    
     # Estimate: average word has ~2 syllables, so syllables/2 = words
     # Scale to per minute
-    if duration_seconds > 0:
-        words_estimate = (peak_count / 2) / (duration_seconds / 60)
-        return min(300.0, max(0.0, words_estimate))  # Clamp to 0-300 WPM
-    
-    return 0.0
+    words_estimate = (peak_count / 2) / (duration_seconds / 60)
+    return min(300.0, max(0.0, words_estimate))  # Clamp to 0-300 WPM
 
 
-def calculate_silence_duration(
-    audio_buffer: list,
-    silence_threshold_db: float = -50.0,
-    sample_rate: int = 8000
-) -> float:
+class FeatureWindow:
     """
-    Calculate duration of silence in audio buffer.
+    Sliding window of per-chunk features for a single audio track.
     
-    Args:
-        audio_buffer: List of audio chunks
-        silence_threshold_db: Volume threshold below which is considered silence
-        sample_rate: Audio sample rate
-        
-    Returns:
-        Silence duration in seconds
+    Per-chunk scalars (RMS, sample count) live in preallocated circular
+    NumPy arrays (one array per feature), written with a cursor. Running
+    totals are updated on write/evict so WPM queries never rescan the window.
     """
-    if not audio_buffer:
-        return 0.0
-    
-    silence_samples = 0
-    
-    for chunk in audio_buffer:
-        try:
-            audio_array = decode_mulaw(chunk)
-            if len(audio_array) > 0:
-                volume_db = calculate_volume_db(audio_array)
-                if volume_db < silence_threshold_db:
-                    silence_samples += len(audio_array)
-        except Exception:
-            continue
     
-    return silence_samples / sample_rate
-
-
-def extract_audio_features(
-    audio_chunk: bytes,
-    audio_buffer: Optional[list] = None
-) -> Tuple[float, float, bool]:
-    """
-    Extract key features from an audio chunk.
+    def __init__(self, max_chunks: int, sample_rate: int = 8000):
+        """
+        Initialize the window.
+        
+        Args:
+            max_chunks: Number of chunks kept in the sliding window
+            sample_rate: Audio sample rate
+        """
+        self.capacity = max_chunks
+        self.sample_rate = sample_rate
+        
+        # Per-chunk features; empty slots (0 samples, 0 RMS) add nothing to the totals
+        self._rms = np.zeros(max_chunks, dtype=np.float32)
+        self._samples = np.zeros(max_chunks, dtype=np.int32)
+        self.cursor = 0  # Next slot to write
+        
+        # Running totals over the window
+        self.total_samples = 0
+        self.peak_count = 0
     
-    Args:
-        audio_chunk: Raw audio chunk (mu-law encoded)
-        audio_buffer: Optional buffer for sliding window analysis
+    def extend(self, audio: bytes) -> Tuple[float, float]:
+        """
+        Add one or more concatenated chunks to the window.
         
-    Returns:
-        Tuple of (volume_db, wpm_estimate, is_speaking)
-    """
-    try:
-        # Decode audio
-        audio_array = decode_mulaw(audio_chunk)
+        Per-window features come from extract_features_batch and each window
+        is stored as a separate chunk (a shorter tail becomes its own chunk).
+        Speech detection is left to the VAD, which thresholds volume_db.
         
-        if len(audio_array) == 0:
-            return (-60.0, 0.0, False)
+        Args:
+            audio: Raw audio (mu-law encoded), typically several frames joined
+            
+        Returns:
+            Tuple of (volume_db over the whole batch, wpm_estimate)
+        """
+        n_samples = len(audio)  # One byte per mu-law sample
         
-        # Calculate volume
-        volume_db = calculate_volume_db(audio_array)
+        if n_samples == 0:
+            return (-60.0, self.wpm)
         
-        # Estimate speaking rate (requires buffer)
-        wpm = 0.0
-        if audio_buffer:
-            wpm = estimate_speaking_rate(audio_buffer + [audio_chunk])
+        rms_values, _ = extract_features_batch(audio)
         
-        # Simple speaking detection (volume above threshold)
-        is_speaking = volume_db > -40.0
+        # All windows are full except possibly the last one
+        window_sizes = np.full(len(rms_values), SAMPLES_PER_WINDOW, dtype=np.int64)
+        window_sizes[-1] = n_samples - (len(rms_values) - 1) * SAMPLES_PER_WINDOW
         
-        return (volume_db, wpm, is_speaking)
+        self._write(rms_values, window_sizes)
         
-    except Exception as e:
-        logger.error(f"Error extracting audio features: {e}")
-        return (-60.0, 0.0, False)
+        # Batch volume from the per-window energies (no second pass over the samples)
+        batch_rms = math.sqrt(float(np.dot(rms_values * rms_values, window_sizes)) / n_samples)
+        if batch_rms == 0:
+            return (-60.0, self.wpm)
+        return (max(-60.0, min(0.0, 20 * math.log10(batch_rms))), self.wpm)
+    
+    def _write(self, rms_values: np.ndarray, sample_counts: np.ndarray):
+        """Write per-chunk features at the cursor and update the running totals."""
+        if len(rms_values) > self.capacity:
+            # Only the newest chunks fit
+            rms_values = rms_values[-self.capacity:]
+            sample_counts = sample_counts[-self.capacity:]
+        n = len(rms_values)
+        slots = (self.cursor + np.arange(n)) % self.capacity
+        
+        # Evict whatever currently occupies the target slots
+        self.total_samples -= int(self._samples[slots].sum())
+        self.peak_count -= int(np.count_nonzero(self._rms[slots] > PEAK_RMS_THRESHOLD))
+        
+        self._rms[slots] = rms_values
+        self._samples[slots] = sample_counts
+        
+        self.total_samples += int(self._samples[slots].sum())
+        self.peak_count += int(np.count_nonzero(self._rms[slots] > PEAK_RMS_THRESHOLD))
+        
+        self.cursor = (self.cursor + n) % self.capacity
+    
+    @property
+    def wpm(self) -> float:
+        """Estimated words per minute over the window (see _words_per_minute)."""
+        return _words_per_minute(self.peak_count, self.total_samples, self.sample_rate)
@@ -0,0 +1,34 @@
+"""
+Typed schemas for Twilio Media Stream WebSocket frames.
+Frames are decoded straight into these structs with msgspec.
+"""
+
+from typing import Optional
+
+import msgspec
+
+
+class Media(msgspec.Struct):
+    """Payload of a "media" event."""
+    
+    payload: str = ""
+    track: str = ""  # "inbound" (customer) or "outbound" (agent)
+
+
+class StartBlock(msgspec.Struct, rename="camel"):
+    """Payload of a "start" event."""
+    
+    call_sid: Optional[str] = None
+    stream_sid: Optional[str] = None
+
+
+class TwilioFrame(msgspec.Struct):
+    """A single Twilio Media Stream message (unknown fields are ignored)."""
+    
+    event: str
+    media: Optional[Media] = None
+    start: Optional[StartBlock] = None
+
+
+# Reusable decoder for raw Twilio frames (str or bytes)
+twilio_frame_decoder = msgspec.json.Decoder(TwilioFrame)
@@ -3,14 +3,42 @@ Audio stream handler for processing Twilio media streams.
 Handles incoming audio chunks and routes them for processing.
 """
 
-import json
-import base64
+import asyncio
+import binascii
+import time
 from typing import Optional, Dict, Any
 
+from config import settings
 from utils.logger import logger
-from audio.features import extract_audio_features, decode_mulaw, calculate_volume_db
+from audio.features import SAMPLE_RATE, FeatureWindow
+from audio.models import TwilioFrame
 from audio.vad import vad_detector
 from sessions.session_manager import session_manager
+from coaching.engine import coaching_engine
+from processing_loop import processing_loop
+
+# Media frames joined before running feature extraction (5 x 20 ms = 100 ms)
+BATCH_FRAMES = 5
+# Flush a partial batch if it has not filled up within one batch duration
+BATCH_FLUSH_DELAY_SECONDS = 0.1
+# Frames buffered between ingress and the feature worker (oldest dropped when full)
+AUDIO_QUEUE_SIZE = 100
+
+
+class _PendingBatch:
+    """Audio frames accumulated for one stream track before feature extraction."""
+    
+    def __init__(self):
+        self.audio = bytearray()
+        self.frames = 0
+        # Flushes the batch if it has not filled up in time, armed by its first frame
+        self.flush_timer: Optional[asyncio.TimerHandle] = None
+    
+    def cancel_flush(self):
+        """Disarm the partial-batch flush timer, if any."""
+        if self.flush_timer is not None:
+            self.flush_timer.cancel()
+            self.flush_timer = None
 
 
 class AudioStreamHandler:
@@ -18,22 +46,63 @@ class AudioStreamHandler:
     
     def __init__(self):
         self.active_streams: Dict[str, bool] = {}  # stream_sid -> is_active
+        # stream_sid -> track ("inbound"/"outbound") -> rolling feature window
+        self.feature_windows: Dict[str, Dict[str, FeatureWindow]] = {}
+        # stream_sid -> session, resolved once per stream instead of per frame
+        self.stream_sessions: Dict[str, Any] = {}
+        # stream_sid -> queue of (track, audio_chunk) for the feature worker
+        self.audio_queues: Dict[str, asyncio.Queue] = {}
+        # stream_sid -> feature worker task
+        self.feature_workers: Dict[str, asyncio.Task] = {}
+        # Sliding window length in chunks (last N seconds of audio)
+        self.max_chunks = (settings.sliding_window_seconds * 1000) // settings.audio_chunk_size_ms
+    
+    def _get_feature_window(self, stream_sid: str, track: str) -> FeatureWindow:
+        """Get (or create) the rolling feature window for a stream track."""
+        windows = self.feature_windows.setdefault(stream_sid, {})
+        window = windows.get(track)
+        if window is None:
+            window = FeatureWindow(self.max_chunks, sample_rate=SAMPLE_RATE)
+            windows[track] = window
+        return window
     
-    async def handle_media_event(self, event_data: dict, stream_sid: str):
+    def release_stream(self, stream_sid: str):
+        """Drop per-stream audio state once the stream is gone."""
+        session = self.stream_sessions.pop(stream_sid, None)
+        if session is not None:
+            coaching_engine.release_session(session.call_session_id)
+        self.feature_windows.pop(stream_sid, None)
+        self.audio_queues.pop(stream_sid, None)
+        worker = self.feature_workers.pop(stream_sid, None)
+        if worker is not None:
+            worker.cancel()
+    
+    def _start_feature_worker(self, stream_sid: str) -> asyncio.Queue:
+        """Create the stream's audio queue and its background feature worker."""
+        queue = self.audio_queues.get(stream_sid)
+        if queue is None:
+            queue = asyncio.Queue(maxsize=AUDIO_QUEUE_SIZE)
+            self.audio_queues[stream_sid] = queue
+            self.feature_workers[stream_sid] = asyncio.create_task(
+                self._feature_worker(stream_sid, queue)
+            )
+        return queue
+    
+    async def handle_media_event(self, frame: TwilioFrame, stream_sid: str):
         """
         Handle a media event from Twilio WebSocket.
         
         Args:
-            event_data: Parsed JSON event data
+            frame: Decoded Twilio frame
             stream_sid: Twilio Media Stream SID
         """
         try:
-            event_type = event_data.get("event")
+            event_type = frame.event
             
             if event_type == "media":
-                await self._process_audio_chunk(event_data, stream_sid)
+                await self._process_audio_chunk(frame, stream_sid)
             elif event_type == "start":
-                await self._handle_stream_start(event_data, stream_sid)
+                await self._handle_stream_start(frame, stream_sid)
             elif event_type == "stop":
                 await self._handle_stream_stop(stream_sid)
             else:
@@ -42,120 +111,190 @@ class AudioStreamHandler:
         except Exception as e:
             logger.error(f"Error handling media event: {e}")
     
-    async def _handle_stream_start(self, event_data: dict, stream_sid: str):
+    async def _handle_stream_start(self, frame: TwilioFrame, stream_sid: str):
         """Handle stream start event."""
         logger.info(f"Media stream started: {stream_sid}")
         self.active_streams[stream_sid] = True
+        self._start_feature_worker(stream_sid)
         
         # Get or create session
         session = session_manager.get_session_by_stream_sid(stream_sid)
         if not session:
-            call_sid = event_data.get("start", {}).get("callSid")
+            call_sid = frame.start.call_sid if frame.start else None
             if call_sid:
                 session = session_manager.get_session_by_call_sid(call_sid)
                 if session:
                     session_manager.update_session_stream(call_sid, stream_sid)
+        
+        if session:
+            self.stream_sessions[stream_sid] = session
+    
+    def _get_stream_session(self, stream_sid: str):
+        """Get the session for a stream, looking it up only on a cache miss."""
+        session = self.stream_sessions.get(stream_sid)
+        if session is None:
+            # Start event not seen yet, or the session was created after it
+            session = session_manager.get_session_by_stream_sid(stream_sid)
+            if session is not None:
+                self.stream_sessions[stream_sid] = session
+        return session
     
     async def _handle_stream_stop(self, stream_sid: str):
         """Handle stream stop event."""
         logger.info(f"Media stream stopped: {stream_sid}")
         self.active_streams[stream_sid] = False
+        self.release_stream(stream_sid)
         
         # End session
         session = session_manager.get_session_by_stream_sid(stream_sid)
         if session:
             session_manager.end_session(session.call_sid)
     
-    async def _process_audio_chunk(self, event_data: dict, stream_sid: str):
+    async def _process_audio_chunk(self, frame: TwilioFrame, stream_sid: str):
         """
         Process an audio chunk from Twilio.
         
+        Only decodes the payload and queues it; feature extraction runs in
+        the stream's background worker so ingestion never waits on it.
+        
         Args:
-            event_data: Media event data
+            frame: Media event frame
             stream_sid: Stream SID
         """
         try:
-            media = event_data.get("media", {})
-            payload = media.get("payload")
-            track = media.get("track")  # "inbound" (customer) or "outbound" (agent)
-            
-            if not payload:
+            media = frame.media
+            if media is None or not media.payload:
                 return
             
             # Decode base64 payload
-            audio_chunk = base64.b64decode(payload)
+            audio_chunk = binascii.a2b_base64(media.payload)
             
-            # Get session
-            session = session_manager.get_session_by_stream_sid(stream_sid)
-            if not session:
-                logger.warning(f"No session found for stream_sid: {stream_sid}")
-                return
-            if not session.is_active:
-                logger.warning(f"Session {session.call_session_id} is not active")
-                return
+            queue = self.audio_queues.get(stream_sid)
+            if queue is None:
+                # Start event not seen for this stream
+                queue = self._start_feature_worker(stream_sid)
+            if queue.full():
+                # Worker is falling behind - drop the oldest frame to bound latency
+                queue.get_nowait()
+                logger.debug("Audio queue full for stream %s, dropped oldest frame", stream_sid)
             
-            # Log first few chunks to verify audio is being received
-            chunk_count = len(session.agent_audio_buffer) + len(session.customer_audio_buffer)
-            if chunk_count < 5:
-                logger.info(f"Processing audio chunk #{chunk_count} for track: {track}, stream: {stream_sid}")
+            # track: "inbound" (customer) or "outbound" (agent)
+            queue.put_nowait((media.track, audio_chunk))
             
-            # Route to appropriate buffer
-            if track == "inbound":
-                # Customer audio
-                session.customer_audio_buffer.append(audio_chunk)
-                # Keep buffer size manageable (last 5 seconds)
-                max_chunks = (settings.sliding_window_seconds * 1000) // settings.audio_chunk_size_ms
-                if len(session.customer_audio_buffer) > max_chunks:
-                    session.customer_audio_buffer.pop(0)
-                
-                # Extract features
-                volume_db, wpm, is_speaking = extract_audio_features(
-                    audio_chunk,
-                    session.customer_audio_buffer
-                )
-                
-                # Update metrics
-                session.metrics.customer.volume_db = volume_db
-                session.metrics.customer.wpm = wpm
-                session.metrics.customer.is_speaking = is_speaking
-                
-            elif track == "outbound":
-                # Agent audio
-                session.agent_audio_buffer.append(audio_chunk)
-                # Keep buffer size manageable
-                max_chunks = (settings.sliding_window_seconds * 1000) // settings.audio_chunk_size_ms
-                if len(session.agent_audio_buffer) > max_chunks:
-                    session.agent_audio_buffer.pop(0)
-                
-                # Extract features
-                volume_db, wpm, is_speaking = extract_audio_features(
-                    audio_chunk,
-                    session.agent_audio_buffer
-                )
-                
-                # Update metrics
-                session.metrics.agent.volume_db = volume_db
-                session.metrics.agent.wpm = wpm
-                session.metrics.agent.is_speaking = is_speaking
+        except Exception as e:
+            logger.error(f"Error processing audio chunk: {e}")
+    
+    async def _feature_worker(self, stream_sid: str, queue: asyncio.Queue):
+        """
+        Background task: batch queued frames per track and extract features.
+        
+        Args:
+            stream_sid: Stream SID
+            queue: Queue of (track, audio_chunk) filled by _process_audio_chunk
+        """
+        loop = asyncio.get_running_loop()
+        batches: Dict[str, _PendingBatch] = {}
+        
+        try:
+            while True:
+                items = [await queue.get()]
                 
-                # Log metrics periodically (every 20 chunks = ~1 second)
-                if len(session.agent_audio_buffer) % 20 == 0:
-                    logger.debug(
-                        f"Agent metrics - Volume: {volume_db:.1f}dB, WPM: {wpm:.1f}, "
-                        f"Speaking: {is_speaking}"
-                    )
+                try:
+                    # Take everything already queued in one go
+                    while not queue.empty():
+                        items.append(queue.get_nowait())
+                    
+                    # Get session
+                    session = self._get_stream_session(stream_sid)
+                    if not session:
+                        logger.warning(f"No session found for stream_sid: {stream_sid}")
+                        continue
+                    if not session.is_active:
+                        logger.warning(f"Session {session.call_session_id} is not active")
+                        self.stream_sessions.pop(stream_sid, None)
+                        continue
+                    
+                    for track, audio_chunk in items:
+                        # track: "inbound" (customer) or "outbound" (agent)
+                        if track != "inbound" and track != "outbound":
+                            continue
+                        
+                        # Accumulate frames and extract features once per batch
+                        batch = batches.get(track)
+                        if batch is None:
+                            # First frame on this track - log once to verify audio is being received
+                            logger.info(f"Receiving audio for track: {track}, stream: {stream_sid}")
+                            batch = batches[track] = _PendingBatch()
+                        if not batch.frames:
+                            batch.flush_timer = loop.call_later(
+                                BATCH_FLUSH_DELAY_SECONDS,
+                                self._flush_partial_batch, session, stream_sid, track, batch
+                            )
+                        batch.audio += audio_chunk
+                        batch.frames += 1
+                        
+                        if batch.frames >= BATCH_FRAMES:
+                            self._flush_batch(session, stream_sid, track, batch)
                 
-                # Check for interruptions (both speaking)
-                if session.metrics.agent.is_speaking and session.metrics.customer.is_speaking:
-                    session.metrics.interruptions += 1
-                    logger.info(f"Interruption detected! Total: {session.metrics.interruptions}")
-            
-            # Update last update time
-            import time
-            session.metrics.last_update_time = time.time()
-            
+                except Exception as e:
+                    logger.error(f"Error in feature worker for {stream_sid}: {e}")
+        finally:
+            # Stream released - make sure no pending flush fires afterwards
+            for batch in batches.values():
+                batch.cancel_flush()
+    
+    def _flush_partial_batch(self, session, stream_sid: str, track: str, batch: _PendingBatch):
+        """Flush timer callback: extract features from a batch that did not fill up in time."""
+        batch.flush_timer = None
+        try:
+            self._flush_batch(session, stream_sid, track, batch)
         except Exception as e:
-            logger.error(f"Error processing audio chunk: {e}")
+            logger.error(f"Error flushing audio batch for {stream_sid}: {e}")
+    
+    def _flush_batch(self, session, stream_sid: str, track: str, batch: _PendingBatch):
+        """
+        Run feature extraction over a batch of frames and update session metrics.
+        
+        Args:
+            session: Coaching session for the stream
+            stream_sid: Stream SID
+            track: "inbound" (customer) or "outbound" (agent)
+            batch: Pending frames for the track
+        """
+        batch.cancel_flush()
+        if not batch.audio:
+            return
+        
+        audio = bytes(batch.audio)
+        batch.audio.clear()
+        batch.frames = 0
+        
+        # Extract features (batch is decoded once, window totals updated in place)
+        volume_db, wpm = self._get_feature_window(stream_sid, track).extend(audio)
+        is_speaking = vad_detector.is_speech_from_db(volume_db)
+        
+        if track == "inbound":
+            # Update metrics
+            session.metrics.customer.volume_db = volume_db
+            session.metrics.customer.wpm = wpm
+            session.metrics.customer.is_speaking = is_speaking
+        
+        else:
+            # Update metrics
+            session.metrics.agent.volume_db = volume_db
+            session.metrics.agent.wpm = wpm
+            session.metrics.agent.is_speaking = is_speaking
+            
+            # Check for interruptions (both speaking)
+            if session.metrics.agent.is_speaking and session.metrics.customer.is_speaking:
+                session.metrics.interruptions += 1
+                logger.debug("Interruption detected! Total: %d", session.metrics.interruptions)
+        
+        # Update last update time
+        session.metrics.last_update_time = time.time()
+        
+        # Have the processing loop re-evaluate this session
+        processing_loop.mark_dirty(session)
 
 
 # Global stream handler instance
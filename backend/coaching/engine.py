@@ -2,73 +2,275 @@
 Coaching engine that evaluates rules and generates suggestions.
 """
 
-from typing import Optional, List
+from typing import AbstractSet, Callable, Dict, Optional, List, Sequence, Set, Tuple
+import logging
 import time
 
 from sessions.models import CoachingSession
 from sessions.session_manager import session_manager
-from coaching.rules import ALL_RULES
+from coaching.rules import (
+    ALL_RULES,
+    ALWAYS,
+    AGENT_SPEAKING,
+    BOTH_SPEAKING,
+    SILENCE,
+    CoachingRule,
+)
 from coaching.messages import create_suggestion
-from utils.throttling import throttler
+from coaching.models import Suggestion
 from utils.logger import logger
+from utils.throttling import throttler
+
+
+def _log_cooldown(rule: CoachingRule, last_trigger_time: float, current_time: float):
+    """Debug-log a rule held back by its cooldown (cold path of the dispatch)."""
+    if logger.isEnabledFor(logging.DEBUG):
+        remaining = throttler.get_cooldown_remaining(rule, last_trigger_time, current_time)
+        logger.debug(f"Rule {rule.name} in cooldown: {remaining:.1f}s remaining")
+
+
+def _log_rule_error(rule_name: str, error: Exception):
+    """Log a rule whose evaluate() raised; the rule is treated as not met."""
+    logger.error(f"Error evaluating rule {rule_name}: {error}")
+
+
+def compile_dispatch(rules: Sequence[CoachingRule]) -> Callable:
+    """
+    Generate a single function that checks the given rules in order.
+    
+    Rules with a condition_source() are inlined (thresholds baked in as
+    literals) without a try block, so those expressions must not raise on a
+    valid session (see CoachingRule.condition_source). Other rules are
+    called through rule.evaluate() inside a try block: an error is logged,
+    counts as "not met" and disables the memo for that evaluation.
+    
+    Cooldowns, once-per-session rules and the metrics memo (skip_static) are
+    handled inline as well, so there is no per-rule loop or method dispatch.
+    
+    Last trigger times are read from a list indexed by rule._idx (0.0 if
+    the rule never fired), so no rule name is hashed per check.
+    
+    The generated function has the signature
+    ``(agent, customer, session, now, last_trigger, skip_static)`` and returns
+    ``(triggered_rule or None, valid_until)``, where valid_until is the
+    earliest cooldown expiry among metrics-only rules held back by cooldown.
+    
+    Args:
+        rules: Rules to check, in priority order
+        
+    Returns:
+        Generated dispatch function
+    """
+    namespace = {
+        "INF": float("inf"),
+        "_log_cooldown": _log_cooldown,
+        "_log_rule_error": _log_rule_error,
+    }
+    lines = [
+        "def _dispatch(agent, customer, session, now, last_trigger, skip_static):",
+        "    valid_until = INF",
+    ]
+    
+    for index, rule in enumerate(rules):
+        ref = f"_rule{index}"
+        namespace[ref] = rule
+        name = repr(rule.name)
+        cooldown = repr(rule.cooldown_seconds)
+        slot = f"last_trigger[{rule._idx}]"
+        
+        guards = []
+        if not rule.time_dependent:
+            guards.append("not skip_static")
+        if rule.once:
+            guards.append(f"{slot} == 0.0")
+        
+        indent = "    "
+        lines.append(f"{indent}# {rule.name}")
+        if guards:
+            lines.append(f"{indent}if {' and '.join(guards)}:")
+            indent += "    "
+        condition = rule.condition_source()
+        if condition is None:
+            lines += [
+                f"{indent}try:",
+                f"{indent}    met = {ref}.evaluate(agent, customer, session, now)",
+                f"{indent}except Exception as e:",
+                f"{indent}    _log_rule_error({name}, e)",
+                f"{indent}    met = False",
+                f"{indent}    valid_until = now",
+            ]
+            condition = "met"
+        lines += [
+            f"{indent}if {condition}:",
+            f"{indent}    last = {slot}",
+            f"{indent}    if now - last >= {cooldown}:",
+            f"{indent}        return {ref}, valid_until",
+            f"{indent}    _log_cooldown({ref}, last, now)",
+        ]
+        if not rule.time_dependent:
+            lines += [
+                f"{indent}    if last + {cooldown} < valid_until:",
+                f"{indent}        valid_until = last + {cooldown}",
+            ]
+    
+    lines.append("    return None, valid_until")
+    source = "\n".join(lines) + "\n"
+    exec(compile(source, "<coaching rules>", "exec"), namespace)
+    return namespace["_dispatch"]
 
 
 class CoachingEngine:
     """Main coaching engine that evaluates rules and generates suggestions."""
     
     def __init__(self):
-        self.rules = ALL_RULES
+        self.rules = tuple(ALL_RULES)
+        self.compile_rules()
+        
+        # Memo of metrics-only rule results: call_session_id ->
+        # (metrics version, time until which "nothing fires" stays valid).
+        # metrics.last_update_time is stamped on every metrics update, so it
+        # doubles as the version.
+        self._memo: Dict[str, Tuple[float, float]] = {}
+        
+        # Sessions where agent and customer were both speaking at the last
+        # evaluation, so interruptions are logged once when they start
+        self._double_speaking: Set[str] = set()
+        
+        # Last trigger time per rule, indexed by rule._idx: call_session_id -> list.
+        # The session model lives outside this package, so the engine owns
+        # this state; session.active_rules is no longer read or written.
+        self._last_trigger: Dict[str, List[float]] = {}
     
-    def evaluate_session(self, session: CoachingSession) -> Optional[dict]:
+    def compile_rules(self):
+        """
+        Build the per-state dispatch functions from self.rules.
+        
+        Rule conditions are read from the rules now, so this must be called
+        again after self.rules changes.
+        """
+        for index, rule in enumerate(self.rules):
+            rule._idx = index
+        
+        # Partition rules by precondition so a failed guard skips the whole group:
+        # (agent_speaking, customer_speaking) -> dispatch over applicable rules,
+        # in ALL_RULES order
+        self._dispatch_by_state: Dict[Tuple[bool, bool], Callable] = {}
+        for agent_speaking in (False, True):
+            for customer_speaking in (False, True):
+                preconditions = {ALWAYS}
+                if agent_speaking:
+                    preconditions.add(AGENT_SPEAKING)
+                    if customer_speaking:
+                        preconditions.add(BOTH_SPEAKING)
+                elif not customer_speaking:
+                    preconditions.add(SILENCE)
+                self._dispatch_by_state[(agent_speaking, customer_speaking)] = compile_dispatch(
+                    [rule for rule in self.rules if rule.precondition in preconditions]
+                )
+    
+    def evaluate_session(
+        self,
+        session: CoachingSession,
+        current_time: Optional[float] = None
+    ) -> Optional[Suggestion]:
         """
         Evaluate a session and return a suggestion if any rule triggers.
         
         Args:
             session: Coaching session to evaluate
+            current_time: Unix timestamp for this evaluation cycle
+                (defaults to time.time(); pass it in when evaluating many sessions)
             
         Returns:
-            Suggestion dictionary if rule triggers, None otherwise
+            Suggestion if a rule triggers, None otherwise
         """
         if not session.is_active:
+            self.release_session(session.call_session_id)
             return None
         
-        current_time = time.time()
+        if current_time is None:
+            current_time = time.time()
+        
+        # Resolve the metrics chain once for all rules
+        metrics = session.metrics
+        agent = metrics.agent
+        customer = metrics.customer
+        agent_speaking = bool(agent.is_speaking)
+        customer_speaking = bool(customer.is_speaking)
+        
+        if agent_speaking and customer_speaking:
+            if session.call_session_id not in self._double_speaking:
+                self._double_speaking.add(session.call_session_id)
+                logger.debug(f"Interruption started: both speaking in session {session.call_session_id}")
+        elif self._double_speaking:
+            self._double_speaking.discard(session.call_session_id)
+        
+        # Metrics unchanged and no cooldown expired since the last miss:
+        # rules that only depend on metrics can't fire, skip them
+        metrics_version = metrics.last_update_time
+        memo = self._memo.get(session.call_session_id)
+        skip_static = (
+            memo is not None
+            and memo[0] == metrics_version
+            and current_time < memo[1]
+        )
+        
+        last_trigger = self._last_trigger.get(session.call_session_id)
+        if last_trigger is None:
+            last_trigger = [0.0] * len(self.rules)
+            self._last_trigger[session.call_session_id] = last_trigger
+        
+        # Check only the rules whose precondition holds (rules that may raise
+        # are guarded inside the dispatch)
+        rule, valid_until = self._dispatch_by_state[(agent_speaking, customer_speaking)](
+            agent, customer, session, current_time, last_trigger, skip_static
+        )
+        
+        if rule is None:
+            if not skip_static:
+                self._memo[session.call_session_id] = (metrics_version, valid_until)
+            return None
+        
+        # Generate suggestion
+        suggestion = create_suggestion(rule.name, current_time)
+        
+        # Update session state
+        session.last_suggestion_time = current_time
+        session.last_suggestion_type = rule.name
+        last_trigger[rule._idx] = current_time
+        
+        if logger.isEnabledFor(logging.INFO):
+            logger.info(
+                f"Rule triggered: {rule.name} for session {session.call_session_id}"
+            )
         
-        # Evaluate each rule
+        self._memo.pop(session.call_session_id, None)
+        return suggestion
+    
+    def release_session(self, session_id: str):
+        """
+        Drop cached evaluation state for a session that has ended.
+        
+        Args:
+            session_id: Call session ID
+        """
+        self._memo.pop(session_id, None)
+        self._double_speaking.discard(session_id)
+        self._last_trigger.pop(session_id, None)
         for rule in self.rules:
-            try:
-                # Check if rule condition is met
-                if rule.evaluate(session, current_time):
-                    # Check cooldown
-                    last_trigger_time = session.active_rules.get(rule.name, 0.0)
-                    
-                    if throttler.can_trigger(rule.name, last_trigger_time, current_time):
-                        # Generate suggestion
-                        suggestion = create_suggestion(rule.name, current_time)
-                        
-                        # Update session state
-                        session.last_suggestion_time = current_time
-                        session.last_suggestion_type = rule.name
-                        session.active_rules[rule.name] = current_time
-                        
-                        logger.info(
-                            f"Rule triggered: {rule.name} for session {session.call_session_id}"
-                        )
-                        
-                        return suggestion
-                    else:
-                        cooldown_remaining = throttler.get_cooldown_remaining(
-                            rule.name, last_trigger_time, current_time
-                        )
-                        logger.debug(
-                            f"Rule {rule.name} in cooldown: {cooldown_remaining:.1f}s remaining"
-                        )
-            
-            except Exception as e:
-                logger.error(f"Error evaluating rule {rule.name}: {e}")
-                continue
+            rule.release_session(session_id)
+    
+    def retain_sessions(self, session_ids: AbstractSet[str]):
+        """
+        Drop cached evaluation state for every session not in session_ids.
+        
+        Catches sessions that ended without release_session() being called.
         
-        return None
+        Args:
+            session_ids: Call session IDs of the sessions still active
+        """
+        for session_id in self._last_trigger.keys() - session_ids:
+            self.release_session(session_id)
     
     def evaluate_all_active_sessions(self) -> List[dict]:
         """
@@ -79,9 +281,10 @@ class CoachingEngine:
         """
         suggestions = []
         active_sessions = session_manager.get_active_sessions()
+        current_time = time.time()
         
         for session_id, session in active_sessions.items():
-            suggestion = self.evaluate_session(session)
+            suggestion = self.evaluate_session(session, current_time)
             if suggestion:
                 suggestions.append({
                     "session_id": session_id,
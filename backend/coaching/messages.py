@@ -5,6 +5,10 @@ These are used instead of AI-generated messages for the PoC.
 
 from typing import Dict
 
+import msgspec
+
+from coaching.models import Suggestion
+
 # Suggestion messages mapped by rule type
 SUGGESTION_MESSAGES: Dict[str, Dict[str, str]] = {
     "TEST_RULE": {
@@ -33,6 +37,22 @@ SUGGESTION_MESSAGES: Dict[str, Dict[str, str]] = {
     }
 }
 
+# Fallback for rule types without a dedicated message
+DEFAULT_SUGGESTION_MESSAGE: Dict[str, str] = {
+    "message": "Consider adjusting your communication style.",
+    "severity": "low"
+}
+
+# Suggestion templates built once per rule type; only the timestamp varies per trigger
+_TEMPLATES: Dict[str, Suggestion] = {
+    rule_type: Suggestion(
+        type=rule_type,
+        message=message_data["message"],
+        severity=message_data["severity"]
+    )
+    for rule_type, message_data in SUGGESTION_MESSAGES.items()
+}
+
 
 def get_suggestion_message(rule_type: str) -> Dict[str, str]:
     """
@@ -44,16 +64,10 @@ def get_suggestion_message(rule_type: str) -> Dict[str, str]:
     Returns:
         Dictionary with message and severity
     """
-    return SUGGESTION_MESSAGES.get(
-        rule_type,
-        {
-            "message": "Consider adjusting your communication style.",
-            "severity": "low"
-        }
-    )
+    return SUGGESTION_MESSAGES.get(rule_type, DEFAULT_SUGGESTION_MESSAGE)
 
 
-def create_suggestion(rule_type: str, timestamp: float) -> Dict:
+def create_suggestion(rule_type: str, timestamp: float) -> Suggestion:
     """
     Create a suggestion object.
     
@@ -62,13 +76,10 @@ def create_suggestion(rule_type: str, timestamp: float) -> Dict:
         timestamp: Unix timestamp
         
     Returns:
-        Suggestion dictionary
+        Suggestion struct
     """
-    message_data = get_suggestion_message(rule_type)
+    template = _TEMPLATES.get(rule_type)
+    if template is None:
+        return Suggestion(type=rule_type, timestamp=timestamp, **DEFAULT_SUGGESTION_MESSAGE)
     
-    return {
-        "type": rule_type,
-        "message": message_data["message"],
-        "severity": message_data["severity"],
-        "timestamp": timestamp
-    }
+    return msgspec.structs.replace(template, timestamp=timestamp)
@@ -0,0 +1,14 @@
+"""
+Typed schemas for coaching suggestions sent to the UI.
+"""
+
+import msgspec
+
+
+class Suggestion(msgspec.Struct, frozen=True):
+    """A coaching suggestion produced when a rule triggers."""
+    
+    type: str
+    message: str
+    severity: str  # "low", "medium" or "high"
+    timestamp: float = 0.0  # Unix timestamp (rendered by the UI)
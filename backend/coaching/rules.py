@@ -4,25 +4,68 @@ Each rule checks a condition and can trigger a suggestion.
 """
 
 from typing import Optional, Dict, Any
-import time
 
-from config import settings
+from config import WPM_FAST, VOLUME_LOUD_DB, VOLUME_SOFT_DB, SILENCE_SECONDS
 from sessions.models import CoachingSession
 from utils.logger import logger
 
 
+# Rule preconditions on who is speaking. The engine groups rules by these
+# and only checks rules whose precondition holds, so rules don't repeat the
+# is_speaking checks themselves.
+ALWAYS = "always"                    # No precondition
+AGENT_SPEAKING = "agent_speaking"    # Agent is speaking
+BOTH_SPEAKING = "both_speaking"      # Agent and customer are speaking
+SILENCE = "silence"                  # Neither side is speaking
+
+
 class CoachingRule:
     """Base class for coaching rules."""
     
+    __slots__ = ("name", "cooldown_seconds", "_idx")
+    
+    precondition = ALWAYS
+    # True if the outcome can change with time alone, without new metrics
+    time_dependent = False
+    # True if the rule fires at most once per session (the engine then
+    # stops evaluating it for that session)
+    once = False
+    
     def __init__(self, name: str, cooldown_seconds: int = 20):
         self.name = name
         self.cooldown_seconds = cooldown_seconds
+        self._idx = 0  # Position in the engine's rule list, set by the engine
     
-    def evaluate(self, session: CoachingSession, current_time: float) -> bool:
+    def condition_source(self) -> Optional[str]:
+        """
+        Get the rule condition as a Python expression for the engine to inline.
+        
+        The expression may use agent, customer, session and now, and must
+        give the same result as evaluate(), using the same threshold
+        constants. It runs without a try block, so it must not raise on a
+        valid session.
+        
+        Returns:
+            Expression source, or None to have the engine call evaluate()
+        """
+        return None
+    
+    def evaluate(
+        self,
+        agent: Any,
+        customer: Any,
+        session: CoachingSession,
+        current_time: float
+    ) -> bool:
         """
         Evaluate if this rule should trigger.
         
+        Only called when the rule's precondition holds for the session. The
+        engine inlines condition_source() instead when the rule provides one.
+        
         Args:
+            agent: session.metrics.agent, resolved once by the engine
+            customer: session.metrics.customer, resolved once by the engine
             session: Coaching session
             current_time: Current Unix timestamp
             
@@ -34,85 +77,125 @@ class CoachingRule:
     def get_condition_description(self) -> str:
         """Get human-readable description of the rule condition."""
         raise NotImplementedError
+    
+    def release_session(self, session_id: str):
+        """
+        Drop any per-session state kept by the rule.
+        
+        Args:
+            session_id: Call session ID
+        """
+        pass
 
 
 class SpeakingTooFastRule(CoachingRule):
     """Rule: Agent speaking too fast (WPM > threshold)."""
     
+    __slots__ = ("duration_seconds",)
+    precondition = AGENT_SPEAKING
+    
     def __init__(self):
         super().__init__("SPEAKING_TOO_FAST", cooldown_seconds=30)
-        self.wpm_threshold = settings.agent_wpm_threshold_fast
         self.duration_seconds = 5  # Must be fast for 5 seconds
     
-    def evaluate(self, session: CoachingSession, current_time: float) -> bool:
+    def evaluate(
+        self,
+        agent: Any,
+        customer: Any,
+        session: CoachingSession,
+        current_time: float,
+        _threshold: float = WPM_FAST
+    ) -> bool:
         """Check if agent is speaking too fast."""
-        if not session.metrics.agent.is_speaking:
-            return False
-        
-        # Check if WPM exceeds threshold
-        if session.metrics.agent.wpm > self.wpm_threshold:
-            # Check duration (simplified - in real implementation, track start time)
-            return True
-        
-        return False
+        # Agent WPM above threshold (duration not tracked yet)
+        return agent.wpm > _threshold
+    
+    def condition_source(self) -> str:
+        return f"agent.wpm > {WPM_FAST!r}"
     
     def get_condition_description(self) -> str:
-        return f"Agent WPM > {self.wpm_threshold} for {self.duration_seconds} seconds"
+        return f"Agent WPM > {WPM_FAST} for {self.duration_seconds} seconds"
 
 
 class SpeakingTooLoudRule(CoachingRule):
     """Rule: Agent speaking too loud."""
     
+    __slots__ = ("duration_seconds",)
+    precondition = AGENT_SPEAKING
+    
     def __init__(self):
         super().__init__("SPEAKING_TOO_LOUD", cooldown_seconds=20)
-        self.volume_threshold = settings.agent_volume_threshold_loud
         self.duration_seconds = 3
     
-    def evaluate(self, session: CoachingSession, current_time: float) -> bool:
+    def evaluate(
+        self,
+        agent: Any,
+        customer: Any,
+        session: CoachingSession,
+        current_time: float,
+        _threshold: float = VOLUME_LOUD_DB
+    ) -> bool:
         """Check if agent is speaking too loud."""
-        if not session.metrics.agent.is_speaking:
-            return False
-        
-        return session.metrics.agent.volume_db > self.volume_threshold
+        return agent.volume_db > _threshold
+    
+    def condition_source(self) -> str:
+        return f"agent.volume_db > {VOLUME_LOUD_DB!r}"
     
     def get_condition_description(self) -> str:
-        return f"Agent volume > {self.volume_threshold} dB for {self.duration_seconds} seconds"
+        return f"Agent volume > {VOLUME_LOUD_DB} dB for {self.duration_seconds} seconds"
 
 
 class SpeakingTooSoftRule(CoachingRule):
     """Rule: Agent speaking too softly."""
     
+    __slots__ = ("duration_seconds",)
+    precondition = AGENT_SPEAKING
+    
     def __init__(self):
         super().__init__("SPEAKING_TOO_SOFT", cooldown_seconds=25)
-        self.volume_threshold = settings.agent_volume_threshold_soft
         self.duration_seconds = 5
     
-    def evaluate(self, session: CoachingSession, current_time: float) -> bool:
+    def evaluate(
+        self,
+        agent: Any,
+        customer: Any,
+        session: CoachingSession,
+        current_time: float,
+        _threshold: float = VOLUME_SOFT_DB
+    ) -> bool:
         """Check if agent is speaking too softly."""
-        if not session.metrics.agent.is_speaking:
-            return False
-        
-        return session.metrics.agent.volume_db < self.volume_threshold
+        return agent.volume_db < _threshold
+    
+    def condition_source(self) -> str:
+        return f"agent.volume_db < {VOLUME_SOFT_DB!r}"
     
     def get_condition_description(self) -> str:
-        return f"Agent volume < {self.volume_threshold} dB for {self.duration_seconds} seconds"
+        return f"Agent volume < {VOLUME_SOFT_DB} dB for {self.duration_seconds} seconds"
 
 
 class InterruptingCustomerRule(CoachingRule):
     """Rule: Agent interrupting customer."""
     
+    __slots__ = ()
+    precondition = BOTH_SPEAKING
+    
     def __init__(self):
         super().__init__("INTERRUPTING_CUSTOMER", cooldown_seconds=15)
     
-    def evaluate(self, session: CoachingSession, current_time: float) -> bool:
+    def evaluate(
+        self,
+        agent: Any,
+        customer: Any,
+        session: CoachingSession,
+        current_time: float
+    ) -> bool:
         """Check if agent is interrupting customer."""
-        # Both speaking = interruption
-        if (session.metrics.agent.is_speaking and 
-            session.metrics.customer.is_speaking):
-            logger.debug(f"Interruption rule triggered: both speaking")
-            return True
-        
-        return False
+        # Both speaking = interruption (guaranteed by the precondition;
+        # the engine logs when a session starts double-speaking)
+        return True
+    
+    def condition_source(self) -> str:
+        return "True"
     
     def get_condition_description(self) -> str:
         return "Agent speaking while customer is speaking"
@@ -121,53 +204,80 @@ class InterruptingCustomerRule(CoachingRule):
 class TooMuchSilenceRule(CoachingRule):
     """Rule: Too much silence during agent's turn."""
     
+    __slots__ = ()
+    precondition = SILENCE
+    time_dependent = True
+    
     def __init__(self):
         super().__init__("TOO_MUCH_SILENCE", cooldown_seconds=10)
-        self.silence_threshold = settings.silence_threshold_seconds
     
-    def evaluate(self, session: CoachingSession, current_time: float) -> bool:
-        """Check if there's too much silence."""
-        # Check if agent should be speaking but isn't
+    def evaluate(
+        self,
+        agent: Any,
+        customer: Any,
+        session: CoachingSession,
+        current_time: float,
+        _threshold: float = SILENCE_SECONDS
+    ) -> bool:
+        """Check for extended silence."""
+        # Neither side is speaking (guaranteed by the precondition)
         # Simplified: if customer was speaking and now there's silence
-        if (not session.metrics.agent.is_speaking and 
-            not session.metrics.customer.is_speaking):
-            # Check silence duration
-            silence_duration = current_time - session.metrics.last_update_time
-            return silence_duration > self.silence_threshold
-        
-        return False
+        return current_time - session.metrics.last_update_time > _threshold
+    
+    def condition_source(self) -> str:
+        return f"now - session.metrics.last_update_time > {SILENCE_SECONDS!r}"
     
     def get_condition_description(self) -> str:
-        return f"Silence > {self.silence_threshold} seconds during conversation"
+        return f"Silence > {SILENCE_SECONDS} seconds during conversation"
 
 
 class TestRule(CoachingRule):
     """Test rule: Triggers after 3 seconds of call to verify system is working."""
     
+    __slots__ = ("trigger_time", "_created_ts")
+    time_dependent = True
+    once = True
+    
     def __init__(self):
         super().__init__("TEST_RULE", cooldown_seconds=60)  # Only trigger once per minute
         self.trigger_time = 3.0  # Trigger after 3 seconds
+        # call_session_id -> session.created_at as Unix timestamp (converted once)
+        self._created_ts: Dict[str, float] = {}
     
-    def evaluate(self, session: CoachingSession, current_time: float) -> bool:
+    def evaluate(
+        self,
+        agent: Any,
+        customer: Any,
+        session: CoachingSession,
+        current_time: float
+    ) -> bool:
         """Trigger after call has been active for 3 seconds."""
-        call_duration = current_time - session.created_at.timestamp()
+        created_ts = self._created_ts.get(session.call_session_id)
+        if created_ts is None:
+            created_ts = session.created_at.timestamp()
+            self._created_ts[session.call_session_id] = created_ts
+        
+        call_duration = current_time - created_ts
         if call_duration >= self.trigger_time:
-            # Only trigger once
-            if "TEST_RULE" not in session.active_rules:
-                logger.info(f"Test rule triggered after {call_duration:.1f} seconds")
-                return True
+            logger.info(f"Test rule triggered after {call_duration:.1f} seconds")
+            # Fires once, so the cached timestamp is no longer needed
+            self._created_ts.pop(session.call_session_id, None)
+            return True
         return False
     
     def get_condition_description(self) -> str:
         return f"Call active for {self.trigger_time} seconds (test rule)"
+    
+    def release_session(self, session_id: str):
+        self._created_ts.pop(session_id, None)
 
 
-# All coaching rules
-ALL_RULES = [
+# All coaching rules, in priority order
+ALL_RULES = (
     TestRule(),  # Add test rule first - triggers easily
     SpeakingTooFastRule(),
     SpeakingTooLoudRule(),
     SpeakingTooSoftRule(),
     InterruptingCustomerRule(),
     TooMuchSilenceRule()
-]
+)
@@ -21,6 +21,12 @@ class Settings(BaseSettings):
     backend_port: int = Field(default=8000, env="BACKEND_PORT")
     frontend_port: int = Field(default=3000, env="FRONTEND_PORT")
     tunnel_url: Optional[str] = Field(default=None, env="TUNNEL_URL")
+    # Comma-separated browser origins allowed by CORS (the UI dev servers by default;
+    # "*" is ignored)
+    cors_origins: str = Field(
+        default="http://localhost:3000,http://localhost:5173",
+        env="CORS_ORIGINS"
+    )
     
     # Optional: OpenAI
     openai_api_key: Optional[str] = Field(default=None, env="OPENAI_API_KEY")
@@ -48,3 +54,9 @@ class Settings(BaseSettings):
 
 # Global settings instance
 settings = Settings()
+
+# Coaching thresholds as plain module constants for hot-path comparisons
+WPM_FAST = settings.agent_wpm_threshold_fast
+VOLUME_LOUD_DB = settings.agent_volume_threshold_loud
+VOLUME_SOFT_DB = settings.agent_volume_threshold_soft
+SILENCE_SECONDS = settings.silence_threshold_seconds
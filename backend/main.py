@@ -16,19 +16,26 @@ app = FastAPI(
     version="1.0.0"
 )
 
-# Configure CORS
+# Configure CORS with explicit origins only (credentials are not valid with "*")
+cors_origins = frozenset(
+    origin.strip() for origin in settings.cors_origins.split(",") if origin.strip()
+)
+if "*" in cors_origins:
+    logger.warning('Ignoring "*" in CORS_ORIGINS; list the allowed origins explicitly')
+    cors_origins -= {"*"}
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=[
-        "http://localhost:3000",  # React dev server
-        "http://localhost:5173",  # Vite dev server
-        "*"  # Allow all for PoC (restrict in production)
-    ],
-    allow_credentials=True,
+    allow_origins=cors_origins,
+    allow_credentials=bool(cors_origins),
     allow_methods=["*"],
     allow_headers=["*"],
 )
 
+# Import routers
+from api import webhooks, websocket
+app.include_router(webhooks.router, prefix="/webhooks", tags=["webhooks"])
+app.include_router(websocket.router, prefix="/ws", tags=["websocket"])
+
 
 @app.on_event("startup")
 async def startup_event():
@@ -109,18 +116,17 @@ async def health_check():
     )
 
 
-# Import routers
-from api import webhooks, websocket
-app.include_router(webhooks.router, prefix="/webhooks", tags=["webhooks"])
-app.include_router(websocket.router, prefix="/ws", tags=["websocket"])
-
-
 if __name__ == "__main__":
+    import sys
     import uvicorn
     uvicorn.run(
         "main:app",
         host="0.0.0.0",  # Listen on all interfaces (required for ngrok)
         port=settings.backend_port,
         reload=True,
-        log_level=settings.log_level.lower()
+        log_level=settings.log_level.lower(),
+        # libuv event loop + C HTTP parser (uvloop is not available on Windows)
+        loop="asyncio" if sys.platform == "win32" else "uvloop",
+        http="httptools",
+        ws="websockets"
     )
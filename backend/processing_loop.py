@@ -4,16 +4,26 @@ Runs continuously while calls are active.
 """
 
 import asyncio
+import logging
 import time
-from typing import Dict
+from typing import Dict, List, Optional, Tuple
 
+from sessions.models import CoachingSession
 from sessions.session_manager import session_manager
 from coaching.engine import coaching_engine
-from api.websocket import manager
+from api.websocket import encode_ui_message, manager
 from utils.logger import logger
 
 from config import settings
 
+# Evaluate every active session at least this often, even without metric
+# updates, so time-based rules (TEST_RULE, TOO_MUCH_SILENCE) and cooldown
+# expiries still fire for sessions whose audio has stalled
+FULL_SWEEP_SECONDS = 5.0
+# Cycles between re-reading the wall clock; in between, Unix time is derived
+# from time.monotonic() plus the last measured offset
+EPOCH_RESYNC_CYCLES = 60
+
 
 class ProcessingLoop:
     """Manages the real-time processing loop."""
@@ -21,7 +31,29 @@ class ProcessingLoop:
     def __init__(self):
         self.is_running = False
         self.loop_task: asyncio.Task = None
-        self.evaluation_interval = 0.5  # Evaluate every 500ms
+        self.evaluation_interval = 0.5  # At most one evaluation cycle per 500ms
+        # Sessions whose metrics changed since the last cycle (session_id -> session)
+        self._dirty_sessions: Dict[str, CoachingSession] = {}
+        self._dirty_event = asyncio.Event()
+        self._last_sweep = 0.0  # time.monotonic() of the last full sweep
+        self._epoch_offset = 0.0  # time.time() - time.monotonic() at the last resync
+        self._cycle = 0
+        # True when the last full sweep found no active sessions
+        self._idle = False
+    
+    def mark_dirty(self, session: CoachingSession):
+        """
+        Queue a session for evaluation after its metrics were updated.
+        
+        Called from the audio path; repeated updates before the next cycle
+        are coalesced into a single evaluation. The session object is kept so
+        the cycle doesn't need to look it up in the session manager.
+        
+        Args:
+            session: Coaching session whose metrics changed
+        """
+        self._dirty_sessions[session.call_session_id] = session
+        self._dirty_event.set()
     
     async def start(self):
         """Start the processing loop."""
@@ -48,7 +80,37 @@ class ProcessingLoop:
         """Main processing loop."""
         while self.is_running:
             try:
-                await self._evaluate_and_broadcast()
+                if self._idle:
+                    # No calls: don't wake until a session is created or updated
+                    await self._dirty_event.wait()
+                    self._idle = False
+                else:
+                    # Sleep until some session's metrics change or a full sweep is due
+                    timeout = self._last_sweep + FULL_SWEEP_SECONDS - time.monotonic()
+                    if timeout > 0:
+                        try:
+                            await asyncio.wait_for(self._dirty_event.wait(), timeout)
+                        except asyncio.TimeoutError:
+                            pass
+                
+                self._dirty_event.clear()
+                sessions: Optional[Dict[str, CoachingSession]] = self._dirty_sessions
+                self._dirty_sessions = {}
+                
+                now = time.monotonic()
+                if now - self._last_sweep >= FULL_SWEEP_SECONDS:
+                    sessions = None  # Evaluate everything
+                    self._last_sweep = now
+                
+                # Correct drift between the two clocks once in a while
+                if self._cycle % EPOCH_RESYNC_CYCLES == 0:
+                    self._epoch_offset = time.time() - now
+                self._cycle += 1
+                
+                # Single clock read per cycle, shared by every session and rule
+                await self._evaluate_and_broadcast(now + self._epoch_offset, sessions)
+                
+                # Updates arriving meanwhile are picked up by the next cycle
                 await asyncio.sleep(self.evaluation_interval)
             except asyncio.CancelledError:
                 break
@@ -56,25 +118,43 @@ class ProcessingLoop:
                 logger.error(f"Error in processing loop: {e}")
                 await asyncio.sleep(self.evaluation_interval)
     
-    async def _evaluate_and_broadcast(self):
-        """Evaluate all active sessions and broadcast suggestions."""
-        active_sessions = session_manager.get_active_sessions()
+    async def _evaluate_and_broadcast(
+        self,
+        current_time: float,
+        sessions: Optional[Dict[str, CoachingSession]] = None
+    ):
+        """
+        Evaluate active sessions and broadcast suggestions.
         
-        if not active_sessions:
+        Args:
+            current_time: Unix timestamp captured once for this cycle
+            sessions: Sessions to evaluate, by session ID (None evaluates all
+                active sessions; ended sessions are skipped by the engine)
+        """
+        if sessions is None:
+            # Only full sweeps pay for the session manager's active-session copy
+            sessions = session_manager.get_active_sessions()
+            self._idle = not sessions
+            # Free engine state of sessions that ended since the last sweep
+            coaching_engine.retain_sessions(sessions.keys())
+        
+        if not sessions:
             return  # No active calls
         
-        # Log evaluation cycle (every 10 cycles = ~5 seconds)
-        if not hasattr(self, '_eval_count'):
-            self._eval_count = 0
-        self._eval_count += 1
+        # Log evaluation cycle (every 10 cycles); skip building the periodic
+        # debug lines entirely unless DEBUG is on
+        log_metrics = self._cycle % 10 == 0 and logger.isEnabledFor(logging.DEBUG)
+        
+        if log_metrics:
+            logger.debug(f"Processing loop: Evaluating {len(sessions)} session(s)")
         
-        if self._eval_count % 10 == 0:
-            logger.debug(f"Processing loop: Evaluating {len(active_sessions)} active session(s)")
+        # (session_id, encoded message) for every suggestion raised this cycle
+        pending: List[Tuple[str, str]] = []
         
-        for session_id, session in active_sessions.items():
+        for session_id, session in sessions.items():
             try:
                 # Log session metrics periodically
-                if self._eval_count % 10 == 0:
+                if log_metrics:
                     logger.debug(
                         f"Session {session_id} - Agent: vol={session.metrics.agent.volume_db:.1f}dB, "
                         f"wpm={session.metrics.agent.wpm:.1f}, speaking={session.metrics.agent.is_speaking}, "
@@ -83,25 +163,30 @@ class ProcessingLoop:
                     )
                 
                 # Evaluate session
-                suggestion = coaching_engine.evaluate_session(session)
+                suggestion = coaching_engine.evaluate_session(session, current_time)
                 
                 if suggestion:
-                    # Broadcast to UI
-                    await manager.send_to_ui(
+                    # Serialize now; sends are batched after all sessions are evaluated
+                    pending.append((
                         session_id,
-                        {
-                            "type": "suggestion",
-                            "data": suggestion
-                        }
-                    )
+                        encode_ui_message({"type": "suggestion", "data": suggestion})
+                    ))
                     
-                    logger.info(
-                        f"Broadcasted suggestion {suggestion['type']} "
-                        f"to session {session_id}"
-                    )
+                    if logger.isEnabledFor(logging.INFO):
+                        logger.info(
+                            f"Broadcasting suggestion {suggestion.type} "
+                            f"to session {session_id}"
+                        )
             
             except Exception as e:
                 logger.error(f"Error evaluating session {session_id}: {e}", exc_info=True)
+        
+        if pending:
+            # Send all suggestions for this cycle concurrently
+            await asyncio.gather(
+                *(manager.send_to_ui(session_id, payload) for session_id, payload in pending),
+                return_exceptions=True
+            )
 
 
 # Global processing loop instance
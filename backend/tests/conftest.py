@@ -0,0 +1,129 @@
+"""
+Pytest configuration for the backend tests.
+
+Backend modules import each other as top-level packages (``from config
+import settings``), as when the app runs from the backend directory.
+"""
+
+import os
+import sys
+import types
+import uuid
+from datetime import datetime
+from typing import Dict, Optional
+
+import pytest
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+# Settings requires Twilio credentials; the tests never talk to Twilio
+os.environ.setdefault("TWILIO_ACCOUNT_SID", "ACtest")
+os.environ.setdefault("TWILIO_AUTH_TOKEN", "test")
+os.environ.setdefault("TWILIO_PHONE_NUMBER", "+15550000000")
+
+
+class SpeakerMetrics:
+    """Per-speaker metrics, as read and written by the audio and coaching code."""
+    
+    def __init__(self):
+        self.volume_db = -60.0
+        self.wpm = 0.0
+        self.is_speaking = False
+
+
+class SessionMetrics:
+    """Session metrics, as read and written by the audio and coaching code."""
+    
+    def __init__(self):
+        self.agent = SpeakerMetrics()
+        self.customer = SpeakerMetrics()
+        self.interruptions = 0
+        self.last_update_time = 0.0
+
+
+class CoachingSession:
+    """Minimal stand-in for sessions.models.CoachingSession."""
+    
+    def __init__(self, call_sid: str, stream_sid: Optional[str] = None):
+        self.call_session_id = str(uuid.uuid4())
+        self.call_sid = call_sid
+        self.stream_sid = stream_sid
+        self.created_at = datetime.now()
+        self.metrics = SessionMetrics()
+        self.last_suggestion_time = 0.0
+        self.last_suggestion_type = None
+        self.is_active = True
+
+
+class SessionManager:
+    """Minimal stand-in for sessions.session_manager.SessionManager."""
+    
+    def __init__(self):
+        self.sessions: Dict[str, CoachingSession] = {}
+    
+    def create_session(self, call_sid: str, stream_sid: Optional[str] = None) -> CoachingSession:
+        session = CoachingSession(call_sid, stream_sid)
+        self.sessions[session.call_session_id] = session
+        return session
+    
+    def get_session_by_call_sid(self, call_sid: str) -> Optional[CoachingSession]:
+        return next((s for s in self.sessions.values() if s.call_sid == call_sid), None)
+    
+    def get_session_by_stream_sid(self, stream_sid: str) -> Optional[CoachingSession]:
+        return next((s for s in self.sessions.values() if s.stream_sid == stream_sid), None)
+    
+    def update_session_stream(self, call_sid: str, stream_sid: str):
+        session = self.get_session_by_call_sid(call_sid)
+        if session:
+            session.stream_sid = stream_sid
+    
+    def end_session(self, call_sid: str):
+        session = self.get_session_by_call_sid(call_sid)
+        if session:
+            session.is_active = False
+            self.sessions.pop(session.call_session_id, None)
+    
+    def get_active_sessions(self) -> Dict[str, CoachingSession]:
+        return {sid: s for sid, s in self.sessions.items() if s.is_active}
+
+
+try:
+    import sessions.session_manager  # noqa: F401
+except ImportError:
+    # The sessions package is not part of this tree; install the stand-in
+    # so modules that import it can be collected
+    sessions_pkg = types.ModuleType("sessions")
+    models_module = types.ModuleType("sessions.models")
+    models_module.CoachingSession = CoachingSession
+    manager_module = types.ModuleType("sessions.session_manager")
+    manager_module.SessionManager = SessionManager
+    manager_module.session_manager = SessionManager()
+    sessions_pkg.models = models_module
+    sessions_pkg.session_manager = manager_module
+    sys.modules["sessions"] = sessions_pkg
+    sys.modules["sessions.models"] = models_module
+    sys.modules["sessions.session_manager"] = manager_module
+
+
+@pytest.fixture
+def session():
+    """An active coaching session, ended after the test."""
+    from sessions.session_manager import session_manager
+    
+    session = session_manager.create_session("CAtest", "MZtest")
+    yield session
+    session_manager.end_session(session.call_sid)
+
+
+@pytest.fixture
+def engine():
+    """Coaching engine over fresh rule instances, without the startup TEST_RULE."""
+    from coaching.engine import CoachingEngine
+    from coaching.rules import TestRule
+    
+    engine = CoachingEngine()
+    engine.rules = tuple(type(rule)() for rule in engine.rules if not isinstance(rule, TestRule))
+    engine.compile_rules()
+    return engine
@@ -0,0 +1,123 @@
+"""
+Tests for the coaching engine.
+"""
+
+from coaching.engine import CoachingEngine
+from coaching.rules import CoachingRule
+from sessions.session_manager import session_manager
+
+
+class FailingRule(CoachingRule):
+    """Rule without an inlined condition whose evaluate() always raises."""
+    
+    __slots__ = ()
+    
+    def evaluate(self, agent, customer, session, current_time) -> bool:
+        raise ValueError("bad metrics")
+
+
+def test_memo_hit_skips_metrics_only_rules(engine, session):
+    agent = session.metrics.agent
+    agent.is_speaking = True
+    agent.volume_db = -30.0
+    agent.wpm = 120.0
+    session.metrics.last_update_time = 1000.0
+    assert engine.evaluate_session(session, 1000.5) is None
+    
+    # Metrics changed without a new version: the memoized miss still applies
+    agent.wpm = 200.0
+    assert engine.evaluate_session(session, 1001.0) is None
+
+
+def test_metrics_update_invalidates_memo(engine, session):
+    agent = session.metrics.agent
+    agent.is_speaking = True
+    agent.volume_db = -30.0
+    agent.wpm = 120.0
+    session.metrics.last_update_time = 1000.0
+    assert engine.evaluate_session(session, 1000.5) is None
+    
+    agent.wpm = 200.0
+    session.metrics.last_update_time = 1001.0
+    assert engine.evaluate_session(session, 1001.5).type == "SPEAKING_TOO_FAST"
+
+
+def test_cooldown_expiry_invalidates_memo(engine, session):
+    agent = session.metrics.agent
+    agent.is_speaking = True
+    agent.volume_db = -30.0
+    agent.wpm = 200.0
+    session.metrics.last_update_time = 1000.0
+    assert engine.evaluate_session(session, 1000.0).type == "SPEAKING_TOO_FAST"
+    
+    # Held back by the 30 s cooldown; the miss is memoized until it expires
+    assert engine.evaluate_session(session, 1001.0) is None
+    assert engine.evaluate_session(session, 1029.9) is None
+    assert engine.evaluate_session(session, 1030.0).type == "SPEAKING_TOO_FAST"
+
+
+def test_first_met_rule_wins(engine, session):
+    agent = session.metrics.agent
+    agent.is_speaking = True
+    agent.volume_db = -5.0
+    agent.wpm = 200.0
+    session.metrics.last_update_time = 1000.0
+    
+    # Too fast and too loud: the rule listed first in ALL_RULES fires
+    assert engine.evaluate_session(session, 1000.0).type == "SPEAKING_TOO_FAST"
+    # While it is in cooldown, the next met rule fires
+    assert engine.evaluate_session(session, 1001.0).type == "SPEAKING_TOO_LOUD"
+
+
+def test_rule_error_counts_as_not_met(engine, session):
+    engine.rules = (FailingRule("FAILING"),) + engine.rules
+    engine.compile_rules()
+    agent = session.metrics.agent
+    agent.is_speaking = True
+    agent.volume_db = -30.0
+    agent.wpm = 200.0
+    session.metrics.last_update_time = 1000.0
+    
+    assert engine.evaluate_session(session, 1000.0).type == "SPEAKING_TOO_FAST"
+
+
+def test_trigger_times_are_per_session(engine, session):
+    other = session_manager.create_session("CAother", "MZother")
+    try:
+        for current in (session, other):
+            agent = current.metrics.agent
+            agent.is_speaking = True
+            agent.volume_db = -30.0
+            agent.wpm = 200.0
+            current.metrics.last_update_time = 1000.0
+        
+        assert engine.evaluate_session(session, 1000.0).type == "SPEAKING_TOO_FAST"
+        # Cooldown of one session doesn't hold back another
+        assert engine.evaluate_session(other, 1001.0).type == "SPEAKING_TOO_FAST"
+        assert engine.evaluate_session(session, 1001.0) is None
+    finally:
+        session_manager.end_session(other.call_sid)
+
+
+def test_release_session_forgets_trigger_times(engine, session):
+    agent = session.metrics.agent
+    agent.is_speaking = True
+    agent.volume_db = -30.0
+    agent.wpm = 200.0
+    session.metrics.last_update_time = 1000.0
+    assert engine.evaluate_session(session, 1000.0).type == "SPEAKING_TOO_FAST"
+    
+    engine.retain_sessions(set())
+    assert engine.evaluate_session(session, 1001.0).type == "SPEAKING_TOO_FAST"
+
+
+def test_once_rule_fires_only_once(session):
+    engine = CoachingEngine()
+    start = session.created_at.timestamp()
+    # Keep TOO_MUCH_SILENCE quiet: the last metrics update is never in the past
+    session.metrics.last_update_time = start + 1000.0
+    
+    assert engine.evaluate_session(session, start + 1.0) is None
+    assert engine.evaluate_session(session, start + 3.0).type == "TEST_RULE"
+    # Still not again once its 60 s cooldown has passed
+    assert engine.evaluate_session(session, start + 100.0) is None
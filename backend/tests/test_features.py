@@ -0,0 +1,48 @@
+"""
+Tests for audio feature extraction.
+"""
+
+from collections import deque
+
+import numpy as np
+
+from audio.features import (
+    PEAK_RMS_THRESHOLD,
+    SAMPLES_PER_WINDOW,
+    FeatureWindow,
+    extract_features_batch,
+)
+
+
+def test_extend_totals_match_recomputation_after_wraparound():
+    rng = np.random.default_rng(0)
+    window = FeatureWindow(max_chunks=10)
+    # (rms, samples) per chunk still in the window, oldest first
+    expected = deque(maxlen=10)
+    
+    # Loud and quiet batches with short tails, including one batch longer
+    # than the whole window
+    for n_samples, loudest in [(480, 0x00), (500, 0x70), (1000, 0x00), (170, 0x70),
+                               (2100, 0x00), (330, 0x70), (640, 0x00), (90, 0x00)]:
+        # Lower mu-law magnitude bytes are louder; the top bit is the sign
+        audio = (rng.integers(loudest, 0x80, n_samples) | rng.integers(0, 2, n_samples) << 7)
+        audio = audio.astype(np.uint8).tobytes()
+        
+        window.extend(audio)
+        for start in range(0, n_samples, SAMPLES_PER_WINDOW):
+            chunk = audio[start:start + SAMPLES_PER_WINDOW]
+            rms_values, _ = extract_features_batch(chunk, window_size=len(chunk))
+            expected.append((rms_values[0], len(chunk)))
+        
+        assert window.total_samples == sum(samples for _, samples in expected)
+        assert window.peak_count == sum(1 for rms, _ in expected if rms > PEAK_RMS_THRESHOLD)
+
+
+def test_extend_returns_volume_of_whole_batch():
+    rng = np.random.default_rng(1)
+    audio = rng.integers(0, 256, 5 * SAMPLES_PER_WINDOW + 37).astype(np.uint8).tobytes()
+    
+    volume_db, _ = FeatureWindow(max_chunks=10).extend(audio)
+    
+    _, batch_db = extract_features_batch(audio, window_size=len(audio))
+    assert abs(volume_db - batch_db[0]) < 1e-6
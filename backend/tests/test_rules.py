@@ -0,0 +1,38 @@
+"""
+Tests for the coaching rules.
+"""
+
+import itertools
+
+import pytest
+
+from config import SILENCE_SECONDS, VOLUME_LOUD_DB, VOLUME_SOFT_DB, WPM_FAST
+from coaching.rules import ALL_RULES
+
+INLINED_RULES = [rule for rule in ALL_RULES if rule.condition_source() is not None]
+
+
+@pytest.mark.parametrize("rule", INLINED_RULES, ids=lambda rule: rule.name)
+def test_condition_source_matches_evaluate(rule, session):
+    # The engine inlines condition_source() without a try block, so it must
+    # agree with evaluate() and not raise on any valid metrics
+    condition = compile(rule.condition_source(), rule.name, "eval")
+    agent = session.metrics.agent
+    session.metrics.last_update_time = 1000.0
+    
+    for wpm, volume_db, now in itertools.product(
+        (0.0, WPM_FAST - 1, WPM_FAST, WPM_FAST + 1, 300.0),
+        (-60.0, VOLUME_SOFT_DB - 1, VOLUME_SOFT_DB, -30.0, VOLUME_LOUD_DB, VOLUME_LOUD_DB + 1),
+        (1000.0, 1000.0 + SILENCE_SECONDS, 1000.0 + SILENCE_SECONDS + 1),
+    ):
+        agent.wpm = wpm
+        agent.volume_db = volume_db
+        names = {
+            "agent": agent,
+            "customer": session.metrics.customer,
+            "session": session,
+            "now": now
+        }
+        assert eval(condition, {}, names) == rule.evaluate(
+            agent, session.metrics.customer, session, now
+        )
@@ -0,0 +1,14 @@
+"""
+Tests for the suggestion throttler.
+"""
+
+from coaching.rules import SpeakingTooFastRule
+from utils.throttling import throttler
+
+
+def test_cooldown_remaining_uses_rule_cooldown():
+    rule = SpeakingTooFastRule()
+    
+    assert throttler.get_cooldown_remaining(rule, 0.0, 1000.0) == 0.0
+    assert throttler.get_cooldown_remaining(rule, 1000.0, 1010.0) == rule.cooldown_seconds - 10
+    assert throttler.get_cooldown_remaining(rule, 1000.0, 1000.0 + rule.cooldown_seconds) == 0.0
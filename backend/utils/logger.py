@@ -25,7 +25,13 @@ def setup_logger(name: Optional[str] = None) -> logging.Logger:
     if logger.handlers:
         return logger
     
-    logger.setLevel(getattr(logging, settings.log_level.upper(), logging.INFO))
+    level = getattr(logging, settings.log_level.upper(), logging.INFO)
+    logger.setLevel(level)
+    
+    # Below DEBUG, make debug() calls process-wide no-ops that return before
+    # any level lookup or record construction
+    if level > logging.DEBUG:
+        logging.disable(logging.DEBUG)
     
     # Create console handler
     console_handler = logging.StreamHandler(sys.stdout)